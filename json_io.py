@@ -0,0 +1,28 @@
+# json_io.py
+# JSON file helpers shared by the map loader and the map editor
+
+import json
+
+try:
+    import orjson  # much faster (de)serialization when available
+except ImportError:
+    orjson = None
+
+
+def read_json(filename):
+    """Read a JSON file, through orjson when it is installed."""
+    with open(filename, "rb") as f:
+        raw = f.read()
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
+
+def write_json(data, filename, indent=True):
+    """Write data as JSON, through orjson when it is installed; indent=False writes compact JSON."""
+    if orjson:
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else None)
+    elif indent:
+        payload = json.dumps(data, indent=2).encode()
+    else:
+        payload = json.dumps(data, separators=(",", ":")).encode()
+    with open(filename, "wb") as f:
+        f.write(payload)
@@ -1,12 +1,15 @@
 # map_loader_dynamic.py
 # Handles dynamic map loading, saving, shading, and temporary map updates with 2 players
 
-import json
 import os
 import random
-from collections import deque
+from functools import lru_cache
 import shutil
 
+import numpy as np
+
+from json_io import read_json, write_json
+
 # Default colors
 COLORS = {
     "mountain": (120, 120, 120),
@@ -40,18 +43,176 @@ CITY_COLORS = {
 
 }
 
+# Integer terrain codes stored in the grid
+TERRAIN_CODES = {
+    "earth": 0,
+    "water": 1,
+    "mountain": 2,
+}
+EARTH = TERRAIN_CODES["earth"]
+WATER = TERRAIN_CODES["water"]
+MOUNTAIN = TERRAIN_CODES["mountain"]
+# Extra codes only produced by shading, plus a catch-all for unknown terrain names
+LIGHT_WATER = 3
+SNOW_MOUNTAIN = 4
+UNKNOWN_TERRAIN = 5
+TERRAIN_NAMES = {code: name for name, code in TERRAIN_CODES.items()}
+TERRAIN_NAMES[UNKNOWN_TERRAIN] = "unknown"
+
+# Base color per terrain code, as a lookup table for whole-grid indexing
+TERRAIN_RGB = np.array(
+    [
+        COLORS["earth"],
+        COLORS["water"],
+        COLORS["mountain"],
+        COLORS["light_water"],
+        COLORS["snow_mountain"],
+        (255, 0, 0),
+    ],
+    dtype=np.int16,
+)
+
+
+def _color_table(colors, default):
+    """Turn a {player_id: rgb} dict into an array indexable by an owner array."""
+    # One row per possible int8 owner value, so no owner ID can index out of range
+    table = np.full((128, 3), default, dtype=np.int16)
+    for player_id, rgb in colors.items():
+        table[player_id] = rgb
+    return table
+
+
+# Player zone and city colors indexed by owner ID (0 = unowned), for whole-grid indexing
+PLAYER_RGB = _color_table(PLAYER_COLORS, (180, 180, 180))
+CITY_RGB = _color_table(CITY_COLORS, (0, 0, 0))
+
 TEMP_MAP_FILE = "temp_map.json"
 
+# Shared generator for the whole-grid random draws in shading
+rng = np.random.default_rng()
+
+
+class Grid:
+    """Whole-map state stored column-wise: one NumPy array per cell attribute.
+
+    Owner 0 means unowned. Rows of CellView proxies are available through
+    grid[y][x] and iteration, so per-cell code keeps working on top of the arrays.
+    """
+
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.terrain = np.full((rows, cols), EARTH, dtype=np.int8)
+        self.owner = np.zeros((rows, cols), dtype=np.int8)
+        self.is_city = np.zeros((rows, cols), dtype=bool)
+        self.in_zone = np.zeros((rows, cols), dtype=bool)
+        self.display_color = np.zeros((rows, cols, 3), dtype=np.uint8)
+        # Shaded terrain without zones/cities, the bottom layer of display_color
+        self.terrain_color = np.zeros((rows, cols, 3), dtype=np.uint8)
+        self.troops = np.zeros((rows, cols), dtype=np.int32)
+        self.defense_mod = np.ones((rows, cols), dtype=np.float32)
+
+        # Flat indices of the cells owned by each player ID (0 = unowned)
+        self.owner_cells = {0: set(range(rows * cols))}
+        # Sorted flat indices of unowned earth cells, built on demand by add_city_with_zone
+        self.available_earth = None
+
+        # Flat cell list in index order (y * cols + x), and the same cells split into rows
+        self.cells = [CellView(self, x, y) for y in range(rows) for x in range(cols)]
+        self._cell_rows = [self.cells[y * cols:(y + 1) * cols] for y in range(rows)]
+
+    def __len__(self):
+        return self.rows
+
+    def index_owners(self):
+        """Rebuild owner_cells after the owner array was written in bulk."""
+        self.available_earth = None
+        self.owner_cells = {}
+        for index, player_id in enumerate(self.owner.ravel().tolist()):
+            self.owner_cells.setdefault(player_id, set()).add(index)
+
+    def __getitem__(self, y):
+        return self._cell_rows[y]
+
+    def __iter__(self):
+        return iter(self._cell_rows)
+
 
-class Cell:
-    def __init__(self, x, y, terrain, owner=None, is_city=False):
+class CellView:
+    """Attribute-style access to one cell of a Grid; reads and writes go to the arrays."""
+
+    __slots__ = ("grid", "x", "y", "index")
+
+    def __init__(self, grid, x, y):
+        self.grid = grid
         self.x = x
         self.y = y
-        self.terrain = terrain
-        self.owner = owner  # Player ID
-        self.is_city = is_city
-        self.in_zone = False
-        self.display_color = COLORS.get(terrain, (255, 0, 0))
+        self.index = y * grid.cols + x
+
+    @property
+    def terrain(self):
+        return TERRAIN_NAMES[int(self.grid.terrain[self.y, self.x])]
+
+    @terrain.setter
+    def terrain(self, value):
+        self.grid.terrain[self.y, self.x] = TERRAIN_CODES.get(value, UNKNOWN_TERRAIN)
+        self.grid.available_earth = None
+
+    @property
+    def owner(self):
+        # Player ID, None when unowned
+        return int(self.grid.owner[self.y, self.x]) or None
+
+    @owner.setter
+    def owner(self, value):
+        grid = self.grid
+        value = value or 0
+        previous = int(grid.owner[self.y, self.x])
+        if previous != value:
+            grid.owner[self.y, self.x] = value
+            grid.owner_cells[previous].discard(self.index)
+            grid.owner_cells.setdefault(value, set()).add(self.index)
+            grid.available_earth = None
+
+    @property
+    def is_city(self):
+        return bool(self.grid.is_city[self.y, self.x])
+
+    @is_city.setter
+    def is_city(self, value):
+        self.grid.is_city[self.y, self.x] = value
+
+    @property
+    def in_zone(self):
+        return bool(self.grid.in_zone[self.y, self.x])
+
+    @in_zone.setter
+    def in_zone(self, value):
+        self.grid.in_zone[self.y, self.x] = value
+
+    @property
+    def display_color(self):
+        return tuple(self.grid.display_color[self.y, self.x].tolist())
+
+    @display_color.setter
+    def display_color(self, value):
+        self.grid.display_color[self.y, self.x] = value
+
+    @property
+    def troops(self):
+        return int(self.grid.troops[self.y, self.x])
+
+    @troops.setter
+    def troops(self, value):
+        self.grid.troops[self.y, self.x] = value
+
+    @property
+    def defense_mod(self):
+        return float(self.grid.defense_mod[self.y, self.x])
+
+    @defense_mod.setter
+    def defense_mod(self, value):
+        self.grid.defense_mod[self.y, self.x] = value
 
 
 def copy_to_temp_map(filename="map.json"):
@@ -63,53 +224,52 @@ def copy_to_temp_map(filename="map.json"):
 
 
 def load_grid(filename=TEMP_MAP_FILE):
-    """Load temp map, create Cell objects, return grid and size."""
+    """Load temp map into a Grid, return grid and size.
+
+    Reads both the editor's per-cell format and the column format written by save_temp_map.
+    """
     if not os.path.exists(filename):
         raise FileNotFoundError(f"No map file found at {filename}")
 
-    with open(filename, "r") as f:
-        data = json.load(f)
+    data = read_json(filename)
 
     rows = data.get("rows", 18)
     cols = data.get("columns", 30)
-    grid_data = data.get("cells", [])
-
-    grid = []
-    for y in range(rows):
-        row = []
-        for x in range(cols):
-            cell_data = grid_data[y][x]
-            terrain = cell_data.get("terrain", "earth")
-            owner = cell_data.get("owner")
-            is_city = cell_data.get("is_city", False)
-            cell = Cell(x, y, terrain, owner, is_city)
-            row.append(cell)
-        grid.append(row)
-
+    grid = Grid(rows, cols)
+
+    if "terrain" in data:
+        # Columns are flat lists in index order (y * cols + x)
+        grid.terrain[:] = np.reshape(data["terrain"], (rows, cols))
+        grid.owner[:] = np.reshape(data["owner"], (rows, cols))
+        grid.is_city[:] = np.reshape(data["is_city"], (rows, cols))
+    else:
+        grid_data = data.get("cells", [])
+        for y in range(rows):
+            for x in range(cols):
+                cell_data = grid_data[y][x]
+                grid.terrain[y, x] = TERRAIN_CODES.get(cell_data.get("terrain", "earth"), UNKNOWN_TERRAIN)
+                grid.owner[y, x] = cell_data.get("owner") or 0
+                grid.is_city[y, x] = cell_data.get("is_city", False)
+
+    grid.index_owners()
+    grid.terrain_color[:] = TERRAIN_RGB[grid.terrain]
+    grid.display_color[:] = grid.terrain_color
     return grid, rows, cols
 
 
 def save_temp_map(grid, filename=TEMP_MAP_FILE):
-    """Save the current grid state to temp_map.json."""
-    rows = len(grid)
-    cols = len(grid[0])
+    """Save the current grid state to temp_map.json, one flat list per column.
+
+    Written compact: the temp map is only read back by load_grid, never by people.
+    """
     data = {
-        "columns": cols,
-        "rows": rows,
-        "cells": [
-            [
-                {
-                    "terrain": cell.terrain,
-                    "owner": cell.owner,
-                    "is_city": cell.is_city
-                }
-                for cell in row
-            ]
-            for row in grid
-        ],
+        "columns": grid.cols,
+        "rows": grid.rows,
+        "terrain": grid.terrain.ravel().tolist(),
+        "owner": grid.owner.ravel().tolist(),
+        "is_city": grid.is_city.ravel().tolist(),
     }
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=2)
+    write_json(data, filename, indent=False)
 
 
 def neighbors(grid, x, y, radius=1):
@@ -126,85 +286,149 @@ def neighbors(grid, x, y, radius=1):
     return neigh
 
 
-def orthogonal_neighbors(grid, x, y, distance=1):
-    """Return top, bottom, left, right neighbors only."""
-    h = len(grid)
-    w = len(grid[0])
-    neigh = []
-    for d in range(1, distance + 1):
-        for dx, dy in [(-d, 0), (d, 0), (0, -d), (0, d)]:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < w and 0 <= ny < h:
-                neigh.append(grid[ny][nx])
-    return neigh
+@lru_cache(maxsize=None)
+def neighbor_index(rows, cols, distance=1):
+    """Flat indices (y * cols + x) of every cell's orthogonal neighbors, -1 if out of bounds.
+
+    Row i holds the neighbors of flat cell i in the same order as orthogonal_neighbors().
+    Depends only on the grid size, so it is built once and shared.
+    """
+    ys, xs = np.divmod(np.arange(rows * cols), cols)
+    deltas = [delta for d in range(1, distance + 1) for delta in [(-d, 0), (d, 0), (0, -d), (0, d)]]
+    index = np.full((rows * cols, len(deltas)), -1, dtype=np.int32)
+    for k, (dx, dy) in enumerate(deltas):
+        nx, ny = xs + dx, ys + dy
+        inside = (0 <= nx) & (nx < cols) & (0 <= ny) & (ny < rows)
+        index[inside, k] = (ny * cols + nx)[inside]
+    index.flags.writeable = False
+    return index
+
+
+@lru_cache(maxsize=None)
+def neighbor_lists(rows, cols, distance=1):
+    """neighbor_index() as plain lists without the out-of-bounds entries, for Python loops."""
+    return [[i for i in row if i >= 0] for row in neighbor_index(rows, cols, distance).tolist()]
+
+
+def orth4(grid, x, y):
+    """orthogonal_neighbors() for distance=1, the common case, with the bounds checks inlined."""
+    cells = grid.cells
+    w = grid.cols
+    i = y * w + x
+    out = []
+    if x > 0:
+        out.append(cells[i - 1])
+    if x < w - 1:
+        out.append(cells[i + 1])
+    if y > 0:
+        out.append(cells[i - w])
+    if y < grid.rows - 1:
+        out.append(cells[i + w])
+    return out
 
 
-def apply_variance(color, amount=0):
-    r, g, b = color
-    variation = random.randint(-amount, amount)
-    return (
-        max(0, min(255, r + variation // 3)),
-        max(0, min(255, g + variation)),
-        max(0, min(255, b + variation // 3)),
-    )
-
-
-def shade_grid(grid):
-    """Compute display colors once for all cells, based on terrain and adjacency."""
-    h = len(grid)
-    w = len(grid[0])
-
-    for y in range(h):
-        for x in range(w):
-            cell = grid[y][x]
-
-            if cell.terrain == "water":
-                near_land_1 = any(n.terrain != "water" for n in neighbors(grid, x, y, 1))
-                near_land_2 = any(n.terrain != "water" for n in neighbors(grid, x, y, 2))
-
-                if near_land_1:
-                    base = COLORS["light_water"]
-                elif near_land_2 and random.random() < 0.5:
-                    base = COLORS["light_water"]
-                else:
-                    base = COLORS["water"]
-
-            elif cell.terrain == "mountain":
-                neigh = neighbors(grid, x, y, 1)
-                if all(n.terrain == "mountain" for n in neigh):
-                    base = COLORS["snow_mountain"] if random.random() < 0.5 else COLORS["mountain"]
-                else:
-                    base = COLORS["mountain"]
-
-            elif cell.terrain == "earth":
-                base = COLORS["earth"]
-
-            else:
-                base = (255, 0, 0)
-
-            cell.display_color = apply_variance(base)
-
-
-def add_city_with_zone(grid, zone_size=36, player_id=1):
-    """Place a city on earth and assign a zone of control of given size (only on earth)."""
-    earth_cells = [c for row in grid for c in row if c.terrain == "earth" and c.owner is None]
-
-    if not earth_cells:
+def orthogonal_neighbors(grid, x, y, distance=1):
+    """Return top, bottom, left, right neighbors only."""
+    if distance == 1:
+        return orth4(grid, x, y)
+    cells = grid.cells
+    return [cells[i] for i in neighbor_lists(grid.rows, grid.cols, distance)[y * grid.cols + x]]
+
+
+def count_owned_near(grid, index, player_id, distance=1):
+    """Count the orthogonal neighbors within `distance` of flat cell `index` owned by player_id.
+
+    player_id None or 0 counts unowned cells.
+    """
+    player_id = player_id or 0
+    owner = grid.owner.ravel()
+    if distance == 1:
+        y, x = divmod(index, grid.cols)
+        return sum(1 for n in orth4(grid, x, y) if owner[n.index] == player_id)
+    near = neighbor_index(grid.rows, grid.cols, distance)[index]
+    return int(np.count_nonzero(owner[near[near >= 0]] == player_id))
+
+
+def _dilate(mask, radius=1):
+    """Grow a boolean mask by `radius` cells in all 8 directions (out of bounds = False)."""
+    h, w = mask.shape
+    padded = np.pad(mask, radius)
+    out = np.zeros_like(mask)
+    for dy in range(2 * radius + 1):
+        for dx in range(2 * radius + 1):
+            out |= padded[dy:dy + h, dx:dx + w]
+    return out
+
+
+def apply_variance(colors, amount=0):
+    """Randomly brighten/darken an (H, W, 3) int16 color array, mostly on the green channel."""
+    h, w = colors.shape[:2]
+    variation = rng.integers(-amount, amount + 1, size=(h, w), dtype=np.int16)
+    shift = np.stack([variation // 3, variation, variation // 3], axis=-1)
+    return np.clip(colors + shift, 0, 255).astype(np.uint8)
+
+
+def shade_grid(grid, amount=0):
+    """Compute terrain colors once for all cells, based on terrain and adjacency."""
+    h, w = grid.terrain.shape
+
+    terrain = grid.terrain
+    water = terrain == WATER
+    mountain = terrain == MOUNTAIN
+
+    # Water next to land is shallow; one cell further out it is shallow half the time.
+    # The radius-2 land mask grows the radius-1 mask instead of scanning 5x5 again.
+    land_1 = _dilate(~water, 1)
+    land_2 = _dilate(land_1, 1)
+    near_land_1 = water & land_1
+    near_land_2 = water & land_2 & ~near_land_1
+    # Mountains fully surrounded by mountains are snowy half the time
+    inner_mountain = mountain & ~_dilate(~mountain, 1)
+    coin = rng.random((h, w)) < 0.5
+
+    shade = terrain.copy()
+    shade[near_land_1 | (near_land_2 & coin)] = LIGHT_WATER
+    shade[inner_mountain & coin] = SNOW_MOUNTAIN
+
+    grid.terrain_color[:] = apply_variance(TERRAIN_RGB[shade], amount)
+    recompute_display(grid)
+
+
+def add_city_with_zone(grid, zone_size=36, player_id=1, checkpoint=False):
+    """Place a city on earth and assign a zone of control of given size (only on earth).
+
+    With checkpoint=True the temp map is saved right away; otherwise the caller saves
+    once after placing all players.
+    """
+    if grid.available_earth is None:
+        grid.available_earth = np.flatnonzero((grid.terrain == EARTH) & (grid.owner == 0))
+    earth_cells = grid.available_earth
+
+    if not len(earth_cells):
         raise RuntimeError(f"No earth cells to place a city for player {player_id}!")
 
+    # Flat lists for the BFS, converted once for all attempts
+    terrain = grid.terrain.ravel().tolist()
+    owner = grid.owner.ravel().tolist()
+    adjacent = neighbor_lists(grid.rows, grid.cols)
+
     attempts = 0
     while attempts < 100:
         attempts += 1
-        city = random.choice(earth_cells)
-        zone = compute_zone(grid, city, zone_size)
+        city = grid.cells[random.choice(earth_cells)]
+        zone = _zone_indices(terrain, owner, adjacent, city.index, zone_size)
 
         if zone:  # successfully assigned all zone cells
             city.is_city = True
             city.owner = player_id
-            for cell in zone:
+            for i in zone:
+                cell = grid.cells[i]
                 cell.in_zone = True
                 cell.owner = player_id
-            save_temp_map(grid)
+            taken = [city.index] + zone
+            grid.available_earth = np.setdiff1d(earth_cells, taken, assume_unique=True)
+            if checkpoint:
+                save_temp_map(grid)
             return city
 
     raise RuntimeError(f"Could not place a city with enough earth for player {player_id}.")
@@ -212,25 +436,42 @@ def add_city_with_zone(grid, zone_size=36, player_id=1):
 
 def compute_zone(grid, city, max_cells):
     """Compute a more round-looking zone of control using BFS with randomized orthogonal expansion."""
-    visited = set()
+    zone = _zone_indices(
+        grid.terrain.ravel().tolist(),
+        grid.owner.ravel().tolist(),
+        neighbor_lists(grid.rows, grid.cols),
+        city.index,
+        max_cells,
+    )
+    if zone is None:
+        return None
+    return [grid.cells[i] for i in zone]
+
+
+def _zone_indices(terrain, owner, adjacent, start, max_cells):
+    """BFS behind compute_zone, on flat terrain/owner lists and flat cell indices."""
+    # One flag per cell instead of a set of visited indices
+    visited = bytearray(len(terrain))
     zone_cells = []
 
-    queue = deque()
-    queue.append(city)
-    visited.add((city.x, city.y))
+    # Plain list as the frontier: cells are appended at the end and read at `head`
+    queue = [start]
+    head = 0
+    visited[start] = 1
 
-    while queue and len(zone_cells) < max_cells:
-        current = queue.popleft()
-        if current != city and current.terrain == "earth":
+    while head < len(queue) and len(zone_cells) < max_cells:
+        current = queue[head]
+        head += 1
+        if current != start and terrain[current] == EARTH:
             zone_cells.append(current)
 
-        orth_neigh = orthogonal_neighbors(grid, current.x, current.y)
+        orth_neigh = list(adjacent[current])
         random.shuffle(orth_neigh)
 
         for n in orth_neigh:
-            if (n.x, n.y) in visited or n.terrain != "earth" or n.owner is not None:
+            if visited[n] or terrain[n] != EARTH or owner[n]:
                 continue
-            visited.add((n.x, n.y))
+            visited[n] = 1
             queue.append(n)
 
     if len(zone_cells) < max_cells:
@@ -238,24 +479,31 @@ def compute_zone(grid, city, max_cells):
     return zone_cells
 
 
-def shade_city_and_zone(grid):
-    """Shade zones based on ownership with orthogonal borders."""
-    for row in grid:
-        for cell in row:
-            # Base color from terrain
-            base_terrain_color = COLORS.get(cell.terrain, (255, 0, 0))
-
-            if cell.is_city:
-                cell.display_color = CITY_COLORS.get(cell.owner, (0, 0, 0))
-            elif cell.in_zone:
-                border = any(
-                    n.owner != cell.owner for n in orthogonal_neighbors(grid, cell.x, cell.y)
-                )
-                color = PLAYER_COLORS.get(cell.owner, (180, 180, 180))
-                if border:
-                    cell.display_color = color
-                else:
-                    overlay = color
-                    cell.display_color = tuple(
-                        int(base_terrain_color[i] * 0.5 + overlay[i] * 0.5) for i in range(3)
-                    )
+def recompute_display(grid):
+    """Compose display colors in one pass: shaded terrain, zones with orthogonal borders, cities.
+
+    Call after ownership changes; the random terrain shading from shade_grid is kept.
+    """
+    owner = grid.owner
+
+    # A zone cell is a border if any orthogonal neighbor has another owner.
+    # Edge padding makes out-of-bounds neighbors equal to the cell itself.
+    padded = np.pad(owner, 1, mode="edge")
+    border = (
+        (owner != padded[:-2, 1:-1])
+        | (owner != padded[2:, 1:-1])
+        | (owner != padded[1:-1, :-2])
+        | (owner != padded[1:-1, 2:])
+    )
+
+    base_terrain_color = TERRAIN_RGB[grid.terrain]
+    player_color = PLAYER_RGB[owner]
+    city_color = CITY_RGB[owner]
+    blended = (base_terrain_color + player_color) // 2
+
+    zone_color = np.where(border[..., None], player_color, blended)
+    grid.display_color[:] = np.where(
+        grid.is_city[..., None],
+        city_color,
+        np.where(grid.in_zone[..., None], zone_color, grid.terrain_color),
+    )
@@ -4,8 +4,12 @@
 
 import pygame
 import random
-import json
 import os
+from functools import lru_cache
+
+import numpy as np
+
+from json_io import read_json, write_json
 
 pygame.init()
 pygame.font.init()
@@ -89,16 +93,58 @@ def create_grid():
     ]
 
 
-def draw_grid(grid, selected):
+@lru_cache(maxsize=None)
+def grid_pixels(cols, rows):
+    """Surface with one pixel per cell, scaled up to the grid area when drawn."""
+    return pygame.Surface((cols, rows))
+
+
+@lru_cache(maxsize=None)
+def cell_mask(cols, rows):
+    """Opaque white where cells are, transparent in the gaps between them; built once per map size."""
+    width, height = cols * CELL_W, rows * CELL_H
+    mask = pygame.Surface((width, height), pygame.SRCALPHA)
+    mask.fill((255, 255, 255, 255))
+    for x in range(cols + 1):
+        pygame.draw.rect(mask, (0, 0, 0, 0), (x * CELL_W - CELL_MARGIN, 0, 2 * CELL_MARGIN, height))
+    for y in range(rows + 1):
+        pygame.draw.rect(mask, (0, 0, 0, 0), (0, y * CELL_H - CELL_MARGIN, width, 2 * CELL_MARGIN))
+    return mask
+
+
+def render_grid(grid):
+    """Render all cells to a surface of the loaded map's size, for full redraws.
+
+    The gaps between cells are left transparent so whatever is behind the grid shows through.
+    """
+    cols, rows = len(grid[0]), len(grid)
+    pixels = grid_pixels(cols, rows)
+    # surfarray is indexed [x][y], hence the transpose
+    colors = np.array([[cell.color() for cell in row] for row in grid], dtype=np.uint8)
+    pygame.surfarray.blit_array(pixels, colors.transpose(1, 0, 2))
+    grid_surface = pygame.Surface((cols * CELL_W, rows * CELL_H), pygame.SRCALPHA)
+    grid_surface.blit(pygame.transform.scale(pixels, grid_surface.get_size()), (0, 0))
+    grid_surface.blit(cell_mask(cols, rows), (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+    return grid_surface
+
+
+def draw_grid(grid_surface, selected):
     pygame.draw.rect(screen, GRID_BG, (GRID_LEFT, GRID_TOP, GRID_WIDTH, GRID_HEIGHT))
-    for row in grid:
-        for cell in row:
-            pygame.draw.rect(screen, cell.color(), cell.rect())
+    screen.blit(grid_surface, (GRID_LEFT, GRID_TOP))
 
     if selected:
         pygame.draw.rect(screen, SELECTED_BORDER, selected.rect(), 2)
 
 
+def draw_cell(cell, selected):
+    """Redraw one cell directly on screen, with the outline if it is selected; returns its rect."""
+    rect = cell.rect()
+    pygame.draw.rect(screen, cell.color(), rect)
+    if cell is selected:
+        pygame.draw.rect(screen, SELECTED_BORDER, rect, 2)
+    return rect
+
+
 def draw_ui(selected_terrain):
     # Draw terrain buttons
     for i, terrain in enumerate(TERRAIN_ORDER):
@@ -115,12 +161,10 @@ def draw_ui(selected_terrain):
 
 
 def pixel_to_cell(mx, my):
-    if mx < GRID_LEFT or my < GRID_TOP:
-        return None
-    cx = (mx - GRID_LEFT) // CELL_W
-    cy = (my - GRID_TOP) // CELL_H
-    if 0 <= cx < COLUMNS and 0 <= cy < ROWS:
-        return cx, cy
+    dx = mx - GRID_LEFT
+    dy = my - GRID_TOP
+    if 0 <= dx < GRID_WIDTH and 0 <= dy < GRID_HEIGHT:
+        return dx // CELL_W, dy // CELL_H
     return None
 
 
@@ -142,8 +186,7 @@ def save_grid_to_json(grid, filename="map.json"):
             for row in grid
         ],
     }
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=2)
+    write_json(data, filename)
     print(f"✅ Map saved to {filename}")
 
 
@@ -152,8 +195,7 @@ def load_grid_from_json(filename="map.json"):
         print(f"⚠️ No {filename} found — generating new map.")
         return None
 
-    with open(filename, "r") as f:
-        data = json.load(f)
+    data = read_json(filename)
 
     cols = data.get("columns", COLUMNS)
     rows = data.get("rows", ROWS)
@@ -181,6 +223,10 @@ def main():
     selected_terrain = TERRAIN_ORDER[0]  # default painter
     running = True
     right_click_held = False
+    # Whole-window redraws are only needed after reset/load or a painter change;
+    # otherwise just the (x, y) cells in dirty_cells are redrawn and updated
+    full_redraw = True
+    dirty_cells = set()
 
     while running:
         dt = clock.tick(FPS)
@@ -188,16 +234,21 @@ def main():
             if event.type == pygame.QUIT:
                 running = False
 
+            elif event.type == pygame.VIDEOEXPOSE:
+                full_redraw = True
+
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r:
                     grid = create_grid()
                     selected = None
+                    full_redraw = True
                 elif event.key == pygame.K_s:
                     save_grid_to_json(grid)
                 elif event.key == pygame.K_l:
                     loaded = load_grid_from_json()
                     if loaded:
                         grid = loaded
+                        full_redraw = True
 
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 pos = pygame.mouse.get_pos()
@@ -206,8 +257,11 @@ def main():
                     cell_coords = pixel_to_cell(*pos)
                     if cell_coords:
                         cx, cy = cell_coords
+                        if selected:
+                            dirty_cells.add((selected.x, selected.y))
                         selected = grid[cy][cx]
                         selected.cycle_terrain()
+                        dirty_cells.add((cx, cy))
                         # Shift+click toggles city
                         keys = pygame.key.get_pressed()
                         if keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT]:
@@ -218,6 +272,7 @@ def main():
                         rect = pygame.Rect(BUTTON_X, btn_y, BUTTON_WIDTH, BUTTON_HEIGHT)
                         if rect.collidepoint(pos):
                             selected_terrain = terrain
+                            full_redraw = True
                 # Right click starts painting
                 elif event.button == 3:
                     right_click_held = True
@@ -232,12 +287,22 @@ def main():
             cell_coords = pixel_to_cell(mx, my)
             if cell_coords:
                 cx, cy = cell_coords
-                grid[cy][cx].terrain = selected_terrain
-
-        screen.fill(BG)
-        draw_grid(grid, selected)
-        draw_ui(selected_terrain)
-        pygame.display.flip()
+                cell = grid[cy][cx]
+                if cell.terrain != selected_terrain:
+                    cell.terrain = selected_terrain
+                    dirty_cells.add((cx, cy))
+
+        if full_redraw:
+            screen.fill(BG)
+            draw_grid(render_grid(grid), selected)
+            draw_ui(selected_terrain)
+            pygame.display.flip()
+            full_redraw = False
+            dirty_cells.clear()
+        elif dirty_cells:
+            rects = [draw_cell(grid[cy][cx], selected) for cx, cy in dirty_cells]
+            dirty_cells.clear()
+            pygame.display.update(rects)
 
     pygame.quit()
 
@@ -1,12 +1,16 @@
 import pygame
 import random
+
+import numpy as np
 from map_loader_dynamic import (
     copy_to_temp_map,
     load_grid,
+    save_temp_map,
     shade_grid,
     add_city_with_zone,
-    shade_city_and_zone,
-    orthogonal_neighbors,
+    recompute_display,
+    neighbor_lists,
+    count_owned_near,
     PLAYER_COLORS,
     CITY_COLORS
 )
@@ -25,46 +29,54 @@ FONT = pygame.font.SysFont(None, 28)
 INFO_FONT = pygame.font.SysFont(None, 22)
 
 
-def draw_grid(grid, cell_w, cell_h):
-    for row in grid:
-        for cell in row:
-            rect = pygame.Rect(
-                GRID_LEFT + cell.x * cell_w,
-                GRID_TOP + cell.y * cell_h,
-                cell_w,
-                cell_h
-            )
-            pygame.draw.rect(screen, cell.display_color, rect)
+def render_grid(grid, grid_pixels, cell_w, cell_h):
+    """Render the grid display colors to a surface; only needed after the grid changed."""
+    # One pixel per cell, scaled up to cell size; surfarray is indexed [x][y]
+    pygame.surfarray.blit_array(grid_pixels, grid.display_color.transpose(1, 0, 2))
+    return pygame.transform.scale(grid_pixels, (grid.cols * cell_w, grid.rows * cell_h))
+
 
+def draw_grid(grid_surface):
+    screen.blit(grid_surface, (GRID_LEFT, GRID_TOP))
 
-def draw_scoreboard(grid):
-    # Count tiles per player
-    player_tiles = {}
-    for row in grid:
-        for cell in row:
-            if cell.owner:
-                player_tiles[cell.owner] = player_tiles.get(cell.owner, 0) + 1
+
+def render_scoreboard(grid):
+    """Render the sidebar with tiles per player; only needed after the grid changed."""
+    # Count tiles per player (index 0 = unowned)
+    player_tiles = np.bincount(grid.owner.ravel(), minlength=len(PLAYER_COLORS) + 1)
 
     # Draw sidebar background
-    sidebar_rect = pygame.Rect(WIDTH - UI_WIDTH, 0, UI_WIDTH, HEIGHT)
-    pygame.draw.rect(screen, (50, 50, 60), sidebar_rect)
+    sidebar = pygame.Surface((UI_WIDTH, HEIGHT))
+    sidebar.fill((50, 50, 60))
 
     y_offset = 20
-    for player_id, count in sorted(player_tiles.items()):
+    for player_id in range(1, len(player_tiles)):
+        count = player_tiles[player_id]
         if count > 0:
             color = PLAYER_COLORS.get(player_id, (180, 180, 180))
             text = FONT.render(f"Player {player_id}: {count}", True, color)
-            screen.blit(text, (WIDTH - UI_WIDTH + 20, y_offset))
+            sidebar.blit(text, (20, y_offset))
             y_offset += 40
+    return sidebar
+
 
+def draw_scoreboard(scoreboard_surface):
+    screen.blit(scoreboard_surface, (WIDTH - UI_WIDTH, 0))
 
-def draw_tile_info(grid, cell_w, cell_h):
-    mouse_x, mouse_y = pygame.mouse.get_pos()
-    grid_x = (mouse_x - GRID_LEFT) // cell_w
-    grid_y = (mouse_y - GRID_TOP) // cell_h
 
-    if 0 <= grid_x < len(grid[0]) and 0 <= grid_y < len(grid):
-        cell = grid[grid_y][grid_x]
+def cell_at(grid, pos, cell_w, cell_h):
+    """Return (cell, flat index) under a screen position, or None outside the grid."""
+    dx = pos[0] - GRID_LEFT
+    dy = pos[1] - GRID_TOP
+    if 0 <= dx < grid.cols * cell_w and 0 <= dy < grid.rows * cell_h:
+        index = (dy // cell_h) * grid.cols + dx // cell_w
+        return grid.cells[index], index
+    return None
+
+
+def draw_tile_info(hovered):
+    if hovered:
+        cell, _ = hovered
         owner_text = str(cell.owner) if cell.owner else "None"
         type_text = "City" if cell.is_city else "Zone" if cell.in_zone else "Normal"
         info_lines = [
@@ -99,18 +111,20 @@ def main():
     add_city_with_zone(grid, zone_size=750, player_id=2)
     for i in range(3,9):
         add_city_with_zone(grid, zone_size=150, player_id=i)
+    save_temp_map(grid)
     # Initial shading
-    shade_city_and_zone(grid)
+    recompute_display(grid)
+    grid_pixels = pygame.Surface((cols, rows))
+    grid_surface = None
+    scoreboard_surface = None
+    grid_dirty = True
 
     running = True
     clock = pygame.time.Clock()
 
-    def check_owner(pos):
-        x, y = pos
-        grid_x = (x - GRID_LEFT) // cell_w
-        grid_y = (y - GRID_TOP) // cell_h
-        if 0 <= grid_x < cols and 0 <= grid_y < rows:
-            cell = grid[grid_y][grid_x]
+    def check_owner(hovered):
+        if hovered:
+            cell, _ = hovered
             if not cell.owner:
                 return "unowned"
             return cell.owner
@@ -121,56 +135,68 @@ def main():
             targetplayer = None
         print(f"Attacking player {targetplayer}!")
         attackable_cells = []
-        for row in grid:
-            for cell in row:
-                if cell.owner == targetplayer:
-                    for nx, ny in [(cell.x-1, cell.y), (cell.x+1, cell.y), (cell.x, cell.y-1), (cell.x, cell.y+1)]:
-                        if 0 <= nx < cols and 0 <= ny < rows:
-                            neighbor_cell = grid[ny][nx]
-                            if neighbor_cell.owner == 1 and neighbor_cell.in_zone:
-                                if cell.terrain == "earth" and not cell.is_city:
-                                    attackable_cells.append(cell)
-                                elif cell.terrain == "mountain" and not cell.is_city:
-                                    # check amount of neighbors (distance of 2) owned by player 1
-                                    owned_near = sum(1 for n in orthogonal_neighbors(grid, cell.x, cell.y, distance=2) if n.owner == 1)
-                                    owned_neighbors = sum(1 for n in orthogonal_neighbors(grid, cell.x, cell.y, distance=1) if n.owner == 1)
-                                    # handle cells nea
-                                    if random.random() < 0.02*owned_near and owned_neighbors > 0:
-
-                                        attackable_cells.append(cell)
-                                elif cell.terrain == "water" and not cell.is_city:
-                                    if random.random() < 0:
-                                        attackable_cells.append(cell)
-                                elif cell.is_city:
-                                    owned_near = sum(1 for n in orthogonal_neighbors(grid, cell.x, cell.y, distance=2) if n.owner == 1)
-                                    owned_neighbors = sum(1 for n in orthogonal_neighbors(grid, cell.x, cell.y, distance=1) if n.owner == 1)
-                                    # handle cells nea
-                                    if random.random() < 0.01*owned_near and owned_neighbors > 0:
-
-                                        attackable_cells.append(cell)
-                                break
+        cells = grid.cells
+        adjacent = neighbor_lists(rows, cols)
+        # Only visit the target's cells, in map order
+        for i in sorted(grid.owner_cells.get(targetplayer or 0, ())):
+            cell = cells[i]
+            for j in adjacent[i]:
+                neighbor_cell = cells[j]
+                if neighbor_cell.owner == 1 and neighbor_cell.in_zone:
+                    if cell.terrain == "earth" and not cell.is_city:
+                        attackable_cells.append(cell)
+                    elif cell.terrain == "mountain" and not cell.is_city:
+                        # check amount of neighbors (distance of 2) owned by player 1
+                        owned_near = count_owned_near(grid, i, 1, distance=2)
+                        owned_neighbors = count_owned_near(grid, i, 1)
+                        # handle cells nea
+                        if random.random() < 0.02*owned_near and owned_neighbors > 0:
+
+                            attackable_cells.append(cell)
+                    elif cell.terrain == "water" and not cell.is_city:
+                        if random.random() < 0:
+                            attackable_cells.append(cell)
+                    elif cell.is_city:
+                        owned_near = count_owned_near(grid, i, 1, distance=2)
+                        owned_neighbors = count_owned_near(grid, i, 1)
+                        # handle cells nea
+                        if random.random() < 0.01*owned_near and owned_neighbors > 0:
+
+                            attackable_cells.append(cell)
+                    break
         if attackable_cells:
             for cell in attackable_cells:
                 cell.owner = 1
                 cell.in_zone = True
             # Reshade after attack
-            shade_city_and_zone(grid)
+            recompute_display(grid)
+            return True
+        return False
 
     while running:
         clock.tick(30)
+        # Cell under the mouse, shared by the attack key and the tile info panel
+        hovered = cell_at(grid, pygame.mouse.get_pos(), cell_w, cell_h)
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
-                    targetplayer = check_owner(pygame.mouse.get_pos())
+                    targetplayer = check_owner(hovered)
                     if targetplayer and targetplayer != 1:
-                        launch_attack(targetplayer)
+                        if launch_attack(targetplayer):
+                            grid_dirty = True
+
+        # Only re-render the grid and scoreboard when an attack changed them
+        if grid_dirty:
+            grid_surface = render_grid(grid, grid_pixels, cell_w, cell_h)
+            scoreboard_surface = render_scoreboard(grid)
+            grid_dirty = False
 
         screen.fill((30, 30, 40))
-        draw_grid(grid, cell_w, cell_h)
-        draw_scoreboard(grid)
-        draw_tile_info(grid, cell_w, cell_h)
+        draw_grid(grid_surface)
+        draw_scoreboard(scoreboard_surface)
+        draw_tile_info(hovered)
         pygame.display.flip()
 
 